@@ -24,115 +24,451 @@
 import sys
 import signal
 import threading
+import queue
+import concurrent.futures
+import collections
+import math
+import subprocess
+import datetime
 import time
 import yaml
-import tempfile
-import glob
-import git  # type: ignore
-import git.exc  # type: ignore
 import irc  # type: ignore
 import irc.bot  # type: ignore
 import logging
+import json
 import os
-from typing import Optional, Iterator, List, Mapping, Any, Union
-
-
-def _format_commit(
-    commit: git.Commit,
-    before_dt: str = '',
-    after_dt: str = '',
-    before_hash: str = '',
-    after_hash: str = '',
-    before_summary: str = '',
-    after_summary: str = '',
-    before_author: str = '',
-    after_author: str = '',
-    before_insertions: str = '',
-    after_insertions: str = '',
-    before_deletions: str = '',
-    after_deletions: str = '',
-) -> str:
-    dt_str = commit.authored_datetime.strftime('%Y-%m-%d %H:%M')
-    dt = f'{before_dt}{dt_str}{after_dt}'
-    hash = f'{before_hash}{commit.hexsha[:8]}{after_hash}'
-    summary = f'{before_summary}{commit.summary}{after_summary}'
-    author = f'{before_author}{commit.author.name}{after_author}'
-    insertions = (
-        f'{before_insertions}+{commit.stats.total["insertions"]}{after_insertions}'
+from typing import Optional, List, Dict, Mapping, Any, Union, Callable, NamedTuple
+
+# prefer the libyaml-based loader when available
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader  # type: ignore
+
+
+class _Commit(NamedTuple):
+    hexsha: str
+    authored_datetime: datetime.datetime
+    author_name: str
+    summary: str
+    insertions: int
+    deletions: int
+
+
+# New commits of a repository: `commits` (oldest first) are the most
+# recent ones out of `total_count` new commits.
+class _NewCommits(NamedTuple):
+    commits: List[_Commit]
+    total_count: int
+
+
+# Formats of a commit for _format_commit(): plain, and with IRC
+# formatting codes.
+_PLAIN_COMMIT_FMT = '{dt}: [{author}] {hash} {summary} (+{insertions} -{deletions})'
+_IRC_COMMIT_FMT = (
+    '\x02\x0312{dt}\x0f: [\x0303{author}\x0f] \x0307{hash}\x0f \x0f{summary}\x0f '
+    '(\x02\x0309+{insertions}\x0f \x02\x0304-{deletions}\x0f)'
+)
+
+
+def _format_commit(commit: _Commit, fmt: str = _PLAIN_COMMIT_FMT) -> str:
+    return fmt.format_map(
+        {
+            'dt': commit.authored_datetime.strftime('%Y-%m-%d %H:%M'),
+            'hash': commit.hexsha[:8],
+            'summary': commit.summary,
+            'author': commit.author_name,
+            'insertions': commit.insertions,
+            'deletions': commit.deletions,
+        }
     )
-    deletions = f'{before_deletions}-{commit.stats.total["deletions"]}{after_deletions}'
-    return f'{dt}: [{author}] {hash} {summary} ({insertions} {deletions})'
+
+
+# Returns the directory in which to keep the Git repository clones.
+def _get_cache_dir() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or '~/.cache'
+    return os.path.join(os.path.expanduser(cache_home), 'combotsha')
 
 
 class _Repository:
-    def __init__(self, name: str, url: str, last_seen_commit_sha: Optional[str] = None):
+    # `git log` format of a single commit: the ASCII record separator,
+    # then fields separated with the ASCII unit separator (commit
+    # messages don't contain either in practice).
+    #
+    # The summary is the first line of the raw message (`%B`), like
+    # GitPython's `Commit.summary`: `%s` joins all the lines of the
+    # first paragraph. The last separator precedes the `--numstat`
+    # output.
+    _COMMIT_FORMAT = '%x1e%H%x1f%aI%x1f%an%x1f%B%x1f'
+
+    # Each consecutive poll without new commits doubles the polling
+    # interval, up to this many seconds (or the base polling interval if
+    # it's greater).
+    _MAX_POLL_INTERVAL = 300
+
+    # Git configuration of the clone:
+    #
+    # * Fetching every few seconds must not trigger automatic garbage
+    #   collections, which can stall a fetch for a long time; see gc()
+    #   instead.
+    #
+    # * A bare clone has no fetch refspec: only fetch the remote
+    #   `master` branch into `origin/master`.
+    _GIT_CONFIG = {
+        'gc.auto': '0',
+        'gc.autoPackLimit': '0',
+        'remote.origin.fetch': '+refs/heads/master:refs/remotes/origin/master',
+    }
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        last_seen_commit_sha: Optional[str] = None,
+        poll_interval: float = 10,
+        max_announce: int = 50,
+    ):
         self._logger = (
             logging.getLogger(__name__).getChild(self.__class__.__name__).getChild(name)
         )
         self._logger.info('Creating repository object.')
         self._name = name
         self._url = url
-        self._directory = tempfile.TemporaryDirectory()
-        self._logger.info(
-            f'Cloning Git repository `{url}` within `{self._directory.name}`.'
-        )
-        git.Git(self._directory.name).clone(self._url)
-        self._repo = git.Repo(glob.glob(f'{self._directory.name}/*/')[0])
-
-        if last_seen_commit_sha is not None:
-            self._last_seen_commit = self._repo.commit(last_seen_commit_sha)
+        self._poll_interval = poll_interval
+        self._max_announce = max_announce
+        self._next_poll_time = 0.0
+        self._current_poll_interval = poll_interval
+
+        # held while fetching or collecting garbage
+        self._lock = threading.Lock()
+
+        # The clone is kept from one run to the other so that restarting
+        # only needs to fetch the latest commits. Only the path of the
+        # clone is needed: everything else goes through Git commands
+        # (see _run_git()).
+        self._repo_dir = os.path.join(_get_cache_dir(), f'{name}.git')
+
+        if os.path.isfile(os.path.join(self._repo_dir, 'HEAD')):
+            self._logger.info(f'Reusing Git repository clone `{self._repo_dir}`.')
+            self._run_git('remote', 'set-url', 'origin', url)
+
+            if os.path.isfile(os.path.join(self._repo_dir, 'shallow')):
+                # clone from an older version: see below
+                self._logger.info('Fetching the whole history.')
+                self._fetch('--unshallow')
+            else:
+                self._fetch()
         else:
-            self._last_seen_commit = next(self._commit_iter)
+            self._logger.info(
+                f'Cloning Git repository `{url}` within `{self._repo_dir}`.'
+            )
 
-        self._logger.info(
-            f'Last seen commit is: {_format_commit(self._last_seen_commit)}.'
-        )
+            # The bot only needs the commits: make it a bare, partial
+            # clone without blobs; Git fetches the blobs it needs to
+            # compute the statistics of new commits on demand.
+            #
+            # The clone must not be shallow, though: the new commits
+            # (`<last seen>..origin/master`) are only right over the
+            # whole commit graph. For example, merging a branch which
+            # forked before the shallow boundary would make all the
+            # older commits of the branch look new.
+            #
+            # GitPython is only needed to clone: import it here to save
+            # its import time and memory otherwise.
+            import git  # type: ignore
+
+            git.Git().clone(
+                self._url,
+                self._repo_dir,
+                bare=True,
+                filter='blob:none',
+                single_branch=True,
+                branch='master',
+                no_tags=True,
+            )
 
-    @property
-    def _commit_iter(self) -> Iterator[git.Commit]:
-        return self._repo.iter_commits('origin/master')
+            # a bare clone has no remote-tracking branch
+            self._run_git('update-ref', 'refs/remotes/origin/master', 'master')
+
+        for key, value in self._GIT_CONFIG.items():
+            self._run_git('config', key, value)
+
+        if last_seen_commit_sha is None:
+            last_seen_commit_sha = 'origin/master'
+
+        # Only keep the SHA: computing the statistics of the last seen
+        # commit would need blobs which the partial clone doesn't have.
+        self._last_seen_commit_sha = self._run_git(
+            'rev-parse', '--verify', f'{last_seen_commit_sha}^{{commit}}'
+        ).strip()
+        self._logger.info(f'Last seen commit is `{self._last_seen_commit_sha}`.')
 
     @property
     def name(self) -> str:
         return self._name
 
-    def get_new_commits(self) -> List[git.Commit]:
-        self._logger.debug('Fetching new commits.')
+    @property
+    def last_seen_commit_sha(self) -> str:
+        return self._last_seen_commit_sha
+
+    # `True` if the current polling interval elapsed since the last
+    # get_new_commits() call.
+    @property
+    def is_due(self) -> bool:
+        return time.monotonic() >= self._next_poll_time
+
+    def _run_git(self, *args: str, stdin: Optional[str] = None) -> str:
+        return subprocess.run(
+            ['git', '-C', self._repo_dir, *args],
+            input=stdin,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    # Fetches the remote `master` branch, and nothing else, into
+    # `origin/master`.
+    #
+    # Garbage is collected separately (see gc()) and nothing reads
+    # `FETCH_HEAD`: don't spawn `git maintenance` and don't write it.
+    def _fetch(self, *args: str):
+        self._run_git(
+            'fetch',
+            '--no-tags',
+            '--no-auto-maintenance',
+            '--no-write-fetch-head',
+            '--quiet',
+            *args,
+            'origin',
+            'master',
+        )
+
+    def _get_remote_tip_sha(self) -> str:
+        out = self._run_git('ls-remote', '--exit-code', 'origin', 'refs/heads/master')
+        return out.split('\t', 1)[0]
+
+    # The clone is partial: computing the statistics of the commits
+    # which `git log` lists for the arguments `args` needs blobs which
+    # Git would otherwise lazily fetch, with a new process and request,
+    # commit by commit. Fetches all of them at once instead.
+    def _prefetch_blobs(self, *args: str):
+        out = self._run_git(
+            'log',
+            '--format=',
+            '--raw',
+            '--no-abbrev',
+            '--no-renames',
+            '--diff-merges=first-parent',
+            *args,
+        )
+        blob_shas = set()
+
+        for line in out.splitlines():
+            if not line.startswith(':'):
+                continue
+
+            # `:<old mode> <new mode> <old SHA> <new SHA> <status>\t<path>`
+            old_mode, new_mode, old_sha, new_sha, _ = line[1:].split('\t', 1)[0].split()
+
+            # skip nonexistent sides and submodule commits
+            for mode, sha in ((old_mode, old_sha), (new_mode, new_sha)):
+                if mode not in ('000000', '160000'):
+                    blob_shas.add(sha)
+
+        if len(blob_shas) == 0:
+            return
+
+        self._logger.debug('Prefetching %d blobs.', len(blob_shas))
 
         try:
-            self._repo.remotes.origin.fetch()
-        except (git.exc.GitCommandError, git.exc.BadName) as exc:
-            # Typically, this means the host could not be resolved;
-            # return an empty list and try again later.
-            self._logger.error(f'Git error: {exc}')
-            return []
+            # same command as Git's own lazy fetching
+            self._run_git(
+                '-c',
+                'fetch.negotiationAlgorithm=noop',
+                'fetch',
+                '--no-tags',
+                '--no-write-fetch-head',
+                '--recurse-submodules=no',
+                '--filter=blob:none',
+                '--quiet',
+                '--stdin',
+                'origin',
+                stdin='\n'.join(blob_shas),
+            )
+        except subprocess.CalledProcessError as exc:
+            # Not fatal by itself: `git log` then fetches the missing
+            # blobs lazily, one at a time (and fails if the remote is
+            # still unreachable).
+            self._logger.warning(f'Cannot prefetch blobs: {exc.stderr.strip()}')
+
+    # Returns the commits which `git log` lists for the arguments `args`,
+    # newest first.
+    #
+    # A single `git log` command gets all the fields of all the commits,
+    # including their statistics which, like GitPython's `Commit.stats`,
+    # compare with the first parent.
+    def _get_commits(self, *args: str) -> List[_Commit]:
+        self._prefetch_blobs(*args)
+        out = self._run_git(
+            'log',
+            f'--format={self._COMMIT_FORMAT}',
+            '--numstat',
+            '--no-renames',
+            '--diff-merges=first-parent',
+            *args,
+        )
+        commits = []
+
+        for record in out.split('\x1e')[1:]:
+            hexsha, dt_str, author_name, message, numstat = record.split('\x1f')
+            insertions = 0
+            deletions = 0
+
+            for line in numstat.splitlines():
+                if len(line) == 0:
+                    continue
+
+                line_insertions, line_deletions, _ = line.split('\t', 2)
+
+                # binary files have `-` insertions and deletions
+                if line_insertions != '-':
+                    insertions += int(line_insertions)
+                    deletions += int(line_deletions)
+
+            commits.append(
+                _Commit(
+                    hexsha,
+                    datetime.datetime.fromisoformat(dt_str),
+                    author_name,
+                    message.split('\n', 1)[0],
+                    insertions,
+                    deletions,
+                )
+            )
 
-        new_commits = []
+        return commits
 
-        for commit in self._commit_iter:
-            if commit == self._last_seen_commit:
-                break
+    # Collects garbage in the clone; meant to be called periodically
+    # from a thread other than the one calling get_new_commits().
+    def gc(self):
+        with self._lock:
+            self._logger.info('Collecting garbage.')
 
-            new_commits.append(commit)
+            try:
+                self._run_git('gc', '--quiet')
+            except subprocess.CalledProcessError as exc:
+                self._logger.error(f'Git error: {exc.stderr.strip()}')
 
-        self._logger.debug(f'Found {len(new_commits)} new commits.')
+    # Returns, at most, the `max_announce` most recent new commits: the
+    # last seen commit becomes the newest one regardless.
+    def get_new_commits(self) -> _NewCommits:
+        if not self._lock.acquire(blocking=False):
+            # collecting garbage: try again later
+            self._logger.debug('Busy: not fetching new commits.')
+            return _NewCommits([], 0)
+
+        try:
+            new_commits = self._get_new_commits()
+        finally:
+            self._lock.release()
+
+        # back off while the repository is idle
+        if new_commits.total_count == 0:
+            self._current_poll_interval = min(
+                self._current_poll_interval * 2,
+                max(self._poll_interval, self._MAX_POLL_INTERVAL),
+            )
+        else:
+            self._current_poll_interval = self._poll_interval
 
-        if len(new_commits) > 0:
-            self._last_seen_commit = new_commits[0]
+        self._next_poll_time = time.monotonic() + self._current_poll_interval
+
+        return new_commits
+
+    def _get_new_commits(self) -> _NewCommits:
+        self._logger.debug('Fetching new commits.')
+
+        try:
+            # Getting the remote tip is a single, short exchange (no
+            # pack negotiation): don't fetch when it's unchanged.
+            if self._get_remote_tip_sha() == self._last_seen_commit_sha:
+                self._logger.debug('Remote `master` branch is unchanged.')
+                return _NewCommits([], 0)
+
+            # the clone has the whole commit history: this only fetches
+            # the new commits
+            self._fetch()
+
+            # After a long downtime, there could be thousands of new
+            # commits: count them first, then only get the ones to
+            # announce.
+            range_spec = f'{self._last_seen_commit_sha}..origin/master'
+            total_count = int(self._run_git('rev-list', '--count', range_spec))
+            self._logger.debug('Found %d new commits.', total_count)
+
+            if total_count == 0:
+                return _NewCommits([], 0)
+
+            # needs the remote too: the clone fetches blobs on demand
+            new_commits = self._get_commits(
+                f'--max-count={self._max_announce}', range_spec
+            )
+        except subprocess.CalledProcessError as exc:
+            # Typically, this means the host could not be resolved;
+            # return an empty list and try again later, from the same
+            # last seen commit.
+            self._logger.error(f'Git error: {exc.stderr.strip()}')
+            return _NewCommits([], 0)
+
+        self._last_seen_commit_sha = new_commits[0].hexsha
+
+        # don't format the commit for nothing
+        if self._logger.isEnabledFor(logging.INFO):
             self._logger.info(
-                f'New last seen commit is: {_format_commit(self._last_seen_commit)}.'
+                'New last seen commit is: %s.', _format_commit(new_commits[0])
             )
 
-        return list(reversed(new_commits))
+        return _NewCommits(list(reversed(new_commits)), total_count)
+
+
+class _IrcMsg(NamedTuple):
+    text: str
+
+    # called from the sender thread once `text` is written to the socket
+    on_sent: Optional[Callable[[], None]] = None
 
 
 class _IrcBot(irc.bot.SingleServerIRCBot):
-    def __init__(self, channel_name: str, nick: str, server: str, port: int = 6667):
+    # Messages are sent from a dedicated thread: up to `_MSG_BURST`
+    # messages at once, then at most `max_msgs_per_sec` messages per
+    # second (token bucket).
+    #
+    # Queued messages are kept until the bot is in the channel, and
+    # while it reconnects: they're only dropped when the process stops.
+    _MSG_BURST = 5
+
+    # maximum length of an IRC line, including CR LF (RFC 2812)
+    _MAX_LINE_LEN = 512
+
+    def __init__(
+        self,
+        channel_name: str,
+        nick: str,
+        server: str,
+        port: int = 6667,
+        max_msgs_per_sec: float = 1,
+    ):
         super().__init__([irc.bot.ServerSpec(server, port)], nick, nick)
         self._logger = logging.getLogger(__name__).getChild(self.__class__.__name__)
         self._logger.info(f'Creating IRC bot to connect to `{server}:{port}`.')
         self._channel_name = channel_name
         self._connection = None
+        self._max_msgs_per_sec = max_msgs_per_sec
+        self._send_queue: queue.Queue[_IrcMsg] = queue.Queue()
+
+        # set while the bot is in the channel
+        self._joined = threading.Event()
+        threading.Thread(target=self._send_loop, daemon=True).start()
 
     def on_nicknameinuse(self, connection, _):
         new_nick = f'{connection.get_nickname()}_'
@@ -146,13 +482,113 @@ class _IrcBot(irc.bot.SingleServerIRCBot):
         self._connection = connection
         connection.join(self._channel_name)
 
-    def msg_channel(self, msg: str):
-        if self._connection is None:
-            # not connected yet
-            return
+    def on_join(self, connection, event):
+        if event.source.nick == connection.get_nickname():
+            self._logger.info(f'Joined channel `{self._channel_name}`.')
+            self._joined.set()
+
+    def on_disconnect(self, *_):
+        self._joined.clear()
+
+    # Returns the encoded PRIVMSG line to send `msg` to the channel,
+    # truncating `msg` if needed.
+    #
+    # CR and LF within `msg` become spaces: they would otherwise end the
+    # line and make the rest of `msg` a raw IRC command.
+    def _privmsg_line(self, msg: str) -> bytes:
+        prefix = f'PRIVMSG {self._channel_name} :'.encode()
+        max_msg_len = self._MAX_LINE_LEN - len(prefix) - 2
+        msg_bytes = msg.replace('\r', ' ').replace('\n', ' ').encode()
+
+        if len(msg_bytes) > max_msg_len:
+            # don't cut a UTF-8 sequence
+            msg_bytes = msg_bytes[:max_msg_len].decode(errors='ignore').encode()
+
+        return prefix + msg_bytes + b'\r\n'
+
+    # Sends all the messages `msgs` to the channel with a single write,
+    # returning `True` on success.
+    #
+    # This runs on the sender thread while the IRC thread can disconnect
+    # (and later reconnect) at any time: never let a send error stop
+    # this thread, which would leave all the next messages queued
+    # forever.
+    def _privmsg_channel(self, msgs: List[str]) -> bool:
+        # the connection drops its socket when disconnecting
+        sock = None if self._connection is None else self._connection.socket
+
+        if sock is None:
+            self._logger.debug('Not connected: keeping %d messages.', len(msgs))
+            return False
+
+        self._logger.info(
+            'Sending %d private messages to channel `%s`.',
+            len(msgs),
+            self._channel_name,
+        )
+
+        try:
+            sock.sendall(b''.join(self._privmsg_line(msg) for msg in msgs))
+        except OSError as exc:
+            self._logger.error(f'Cannot send private messages: {exc}')
 
-        self._logger.info(f'Sending private message to channel `{self._channel_name}`.')
-        self._connection.privmsg(self._channel_name, msg)
+            # like ServerConnection.send_raw(): the bot then reconnects
+            self._connection.disconnect('Connection reset by peer.')
+            return False
+
+        return True
+
+    def _send_loop(self):
+        tokens = float(self._MSG_BURST)
+        refill_time = time.monotonic()
+
+        # messages to send, oldest first, removed once sent
+        pending: List[_IrcMsg] = []
+
+        while True:
+            if len(pending) == 0:
+                pending.append(self._send_queue.get())
+
+            self._joined.wait()
+            now = time.monotonic()
+            tokens = min(
+                self._MSG_BURST,
+                tokens + (now - refill_time) * self._max_msgs_per_sec,
+            )
+            refill_time = now
+
+            if tokens < 1:
+                wait_duration = (1 - tokens) / self._max_msgs_per_sec
+                time.sleep(wait_duration)
+                tokens = 1
+                refill_time += wait_duration
+
+            # send as many queued messages as the bucket allows at once
+            while len(pending) < int(tokens):
+                try:
+                    pending.append(self._send_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            msgs = pending[: int(tokens)]
+            tokens -= len(msgs)
+
+            if not self._privmsg_channel([msg.text for msg in msgs]):
+                # try again once back in the channel
+                continue
+
+            del pending[: len(msgs)]
+
+            for msg in msgs:
+                if msg.on_sent is not None:
+                    msg.on_sent()
+
+    # Queues `msg` to be sent to the channel; doesn't block.
+    #
+    # Once `msg` is written to the socket, the sender thread calls
+    # `on_sent()`, if set.
+    def msg_channel(self, msg: str, on_sent: Optional[Callable[[], None]] = None):
+        self._send_queue.put(_IrcMsg(msg, on_sent))
 
     def disconnect_from_server(self):
         if self._connection is None:
@@ -176,6 +612,11 @@ def _configure_logging():
         level=level, format='{asctime} [{levelname}] {name}: {message}', style='{'
     )
 
+    # not part of the format: skip collecting them for each record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
 
 def _main():
     def fatal_error(msg: str):
@@ -184,17 +625,19 @@ def _main():
         sys.exit(1)
 
     def create_repos() -> List[_Repository]:
-        cfg_repos = cfg['repos']
-        repos = []
-
-        for repo_cfg in cfg_repos:
-            repos.append(
-                _Repository(
-                    repo_cfg['name'], repo_cfg['url'], repo_cfg.get('last-commit-sha'),
-                )
+        def create_repo(repo_cfg: Mapping[str, Any]) -> _Repository:
+            # the saved state is more recent than the configuration
+            return _Repository(
+                repo_cfg['name'],
+                repo_cfg['url'],
+                state.get(repo_cfg['name'], repo_cfg.get('last-commit-sha')),
+                repo_cfg.get('poll-interval', 10),
+                repo_cfg.get('max-announce', 50),
             )
 
-        return repos
+        # cloning is network-bound too: create the repositories
+        # concurrently, keeping the configuration order
+        return list(executor.map(create_repo, cfg['repos']))
 
     def create_irc_bot() -> _IrcBot:
         cfg_irc = cfg['irc']
@@ -203,9 +646,13 @@ def _main():
             cfg_irc.get('nick', 'combotsha'),
             cfg_irc['server'],
             cfg_irc.get('port', 6667),
+            cfg_irc.get('max-msgs-per-sec', 1),
         )
         logger.info('Starting IRC bot thread.')
-        irc_thread = threading.Thread(target=irc_bot.start)
+
+        # daemon: the IRC client would otherwise keep reconnecting, and
+        # the process running, after the main loop stops
+        irc_thread = threading.Thread(target=irc_bot.start, daemon=True)
         irc_thread.start()
         return irc_bot
 
@@ -217,66 +664,301 @@ def _main():
         logger.info(f'Loading configuration file `{cfg_file_name}`.')
 
         with open(cfg_file_name) as cfg_file:
-            return yaml.load(cfg_file, Loader=yaml.Loader)
+            return yaml.load(cfg_file, Loader=_YamlLoader)
+
+    # Validates the configuration before doing anything expensive, like
+    # cloning repositories.
+    def validate_config():
+        # Checks the optional number property `key` of `obj`, named
+        # `path` in messages.
+        def validate_number(
+            obj: Mapping[str, Any],
+            key: str,
+            path: str,
+            integer: bool = False,
+            allow_zero: bool = False,
+        ):
+            if key not in obj:
+                return
+
+            value = obj[key]
+            kind = 'integer' if integer else 'number'
+
+            if allow_zero:
+                kind = f'positive {kind} or 0'
+            else:
+                kind = f'positive {kind}'
+
+            # a YAML boolean is a Python `int`
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, int if integer else (int, float))
+                or value < 0
+                or (value == 0 and not allow_zero)
+            ):
+                fatal_error(f'`{path}` configuration property must be a {kind}.')
+
+        if not isinstance(cfg, dict):
+            fatal_error('Configuration is not a YAML mapping.')
+
+        validate_number(cfg, 'rotation-cycles', 'rotation-cycles', integer=True)
+        validate_number(cfg, 'gc-interval', 'gc-interval', allow_zero=True)
+
+        cfg_irc = cfg.get('irc')
+
+        if not isinstance(cfg_irc, dict):
+            fatal_error('Missing `irc` configuration object.')
+
+        for key in ('channel', 'server'):
+            if key not in cfg_irc:
+                fatal_error(f'Missing `irc.{key}` configuration property.')
+
+        validate_number(cfg_irc, 'max-msgs-per-sec', 'irc.max-msgs-per-sec')
+
+        cfg_repos = cfg.get('repos')
+
+        if not isinstance(cfg_repos, list) or len(cfg_repos) == 0:
+            fatal_error('Missing or empty `repos` configuration array.')
+
+        names = set()
+
+        for index, repo_cfg in enumerate(cfg_repos):
+            if not isinstance(repo_cfg, dict):
+                fatal_error(f'`repos[{index}]` is not a configuration object.')
+
+            for key in ('name', 'url'):
+                if key not in repo_cfg:
+                    fatal_error(
+                        f'Missing `repos[{index}].{key}` configuration property.'
+                    )
+
+            # the name also names the clone directory
+            if repo_cfg['name'] in names:
+                fatal_error(f'Duplicate repository name `{repo_cfg["name"]}`.')
+
+            names.add(repo_cfg['name'])
+            validate_number(repo_cfg, 'poll-interval', f'repos[{index}].poll-interval')
+            validate_number(
+                repo_cfg,
+                'max-announce',
+                f'repos[{index}].max-announce',
+                integer=True,
+            )
+
+    # `git log --diff-merges` (see _Repository._get_commits()) needs
+    # Git 2.31, and the `git fetch` options of _Repository._fetch()
+    # Git 2.29: fail early instead of failing each poll.
+    def check_git_version():
+        min_version = (2, 31)
+
+        try:
+            out = subprocess.run(
+                ['git', '--version'], capture_output=True, text=True, check=True
+            ).stdout
+        except (OSError, subprocess.CalledProcessError) as exc:
+            fatal_error(f'Cannot run Git: {exc}')
+
+        # `git version 2.39.5`, possibly followed by a vendor suffix
+        try:
+            version_str = out.split()[2]
+            version = tuple(int(part) for part in version_str.split('.')[:2])
+        except (IndexError, ValueError):
+            logger.warning(f'Cannot parse Git version `{out.strip()}`.')
+            return
+
+        if version < min_version:
+            min_version_str = '.'.join(str(part) for part in min_version)
+            fatal_error(
+                f'Git {version_str} is too old: '
+                f'combotsha needs Git {min_version_str} or later.'
+            )
 
+    # The state is the last seen commit SHA of each repository, by name,
+    # so that a restart announces the commits pushed in the meantime
+    # instead of starting over from the current tip.
+    def load_state() -> Dict[str, str]:
+        try:
+            with open(state_path, encoding='utf-8') as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logger.warning(f'Cannot load state file `{state_path}`: {exc}')
+            return {}
+
+        if not isinstance(state, dict):
+            logger.warning(f'Ignoring state file `{state_path}`: not a JSON object.')
+            return {}
+
+        logger.info(f'Loaded state file `{state_path}`.')
+
+        # ignore anything else than a commit SHA
+        return {name: sha for name, sha in state.items() if isinstance(sha, str)}
+
+    # Only saves the commits which are announced: the messages of the
+    # new commits are sent later, from the IRC bot sender thread.
+    def save_state():
+        state = dict(announced_shas)
+        tmp_state_path = f'{state_path}.tmp'
+
+        # write a temporary file, then rename it so that the state file
+        # is never partially written
+        try:
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+
+            with open(tmp_state_path, 'w', encoding='utf-8') as state_file:
+                json.dump(state, state_file, indent=2)
+
+            os.replace(tmp_state_path, state_path)
+        except OSError as exc:
+            logger.error(f'Cannot save state file `{state_path}`: {exc}')
+
+    # Once the repositories exist, only asks the main loop to stop:
+    # exiting from the signal handler could interrupt a Git command at
+    # any point.
+    #
+    # Before, there's nothing to announce nor to save: exit right away
+    # instead of waiting for all the repositories to be created. This
+    # still waits for the running clones, which Git cleans up if the
+    # signal also reaches them (Ctrl+C, for example).
     def configure_signals():
-        def sigint_handler(sig, frame):
-            logger.info('Got SIGINT.')
-            irc_bot.disconnect_from_server()
-            sys.exit(0)
+        def stop_handler(sig, frame):
+            logger.info(f'Got {signal.Signals(sig).name}: stopping.')
+            stop.set()
+
+            if not repos_created.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                irc_bot.disconnect_from_server()
+                sys.exit(0)
 
-        signal.signal(signal.SIGINT, sigint_handler)
+        signal.signal(signal.SIGINT, stop_handler)
+        signal.signal(signal.SIGTERM, stop_handler)
 
     _configure_logging()
     logger = logging.getLogger(__name__).getChild('main')
     cfg = create_config()
-    repos = create_repos()
+    validate_config()
+    check_git_version()
+
+    # Connect to IRC before creating the repositories, which can take a
+    # while.
     irc_bot = create_irc_bot()
+    state_path = os.path.abspath(
+        os.path.expanduser(
+            cfg.get('state-path', os.path.join(_get_cache_dir(), 'state.json'))
+        )
+    )
+    state = load_state()
+
+    # Cloning and fetching are network-bound and independent from one
+    # repository to another: do them concurrently, but keep announcing
+    # from this thread so that IRC messages are never interleaved.
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(8, len(cfg['repos']))
+    )
+    stop = threading.Event()
+    repos_created = threading.Event()
     configure_signals()
+    repos = create_repos()
+    repos_created.set()
+
+    # last announced commit SHA of each repository, as of the last
+    # written message; `state_changed` is set when it changes
+    announced_shas = {repo.name: repo.last_seen_commit_sha for repo in repos}
+    state_changed = threading.Event()
+    save_state()
+
+    def start_gc_thread():
+        gc_interval = cfg.get('gc-interval', 86400)
+
+        if gc_interval == 0:
+            return
+
+        def gc_repos():
+            while not stop.wait(gc_interval):
+                for repo in repos:
+                    repo.gc()
+
+        logger.info('Starting garbage collection thread.')
+        threading.Thread(target=gc_repos, daemon=True).start()
+
+    start_gc_thread()
 
     def sleep(duration: Union[int, float]):
-        logger.debug(f'Sleeping {duration} seconds.')
-        time.sleep(duration)
-
-    def check_repo_new_commits(repo: _Repository):
-        def msg_commit(commit: git.Commit):
-            commit_str = _format_commit(
-                commit,
-                before_dt='\x02\x0312',
-                after_dt='\x0f',
-                before_hash='\x0307',
-                after_hash='\x0f',
-                before_summary='\x0f',
-                after_summary='\x0f',
-                before_author='\x0303',
-                after_author='\x0f',
-                before_insertions='\x02\x0309',
-                after_insertions='\x0f',
-                before_deletions='\x02\x0304',
-                after_deletions='\x0f',
-            )
+        logger.debug('Sleeping %s seconds.', duration)
 
-            irc_bot.msg_channel(f'\x02{repo.name}\x0f: {commit_str}')
+        # returns early when stopping
+        stop.wait(duration)
 
-        logging.debug(f'Getting new commits for repository {repo.name}.')
-        new_commits = repo.get_new_commits()
+    def get_repo_new_commits(repo: _Repository) -> _NewCommits:
+        # called from an executor thread
+        logger.debug('Getting new commits for repository %s.', repo.name)
+        return repo.get_new_commits()
 
-        if len(new_commits) == 0:
-            return
+    def announce_repo_new_commits(repo: _Repository, new_commits: _NewCommits):
+        newest_commit = new_commits.commits[-1]
 
-        rate_limit = False
+        # called from the IRC bot sender thread
+        def on_newest_commit_sent():
+            announced_shas[repo.name] = newest_commit.hexsha
+            state_changed.set()
 
-        if len(new_commits) > 5:
-            rate_limit = True
+        def msg_commit(commit: _Commit):
+            commit_str = _format_commit(commit, _IRC_COMMIT_FMT)
+            on_sent = on_newest_commit_sent if commit is newest_commit else None
 
-        for commit in new_commits:
+            irc_bot.msg_channel(f'\x02{repo.name}\x0f: {commit_str}', on_sent)
+
+        if new_commits.total_count > len(new_commits.commits):
+            irc_bot.msg_channel(
+                f'\x02{repo.name}\x0f: showing the last {len(new_commits.commits)} '
+                f'of {new_commits.total_count} new commits'
+            )
+
+        for commit in new_commits.commits:
             msg_commit(commit)
 
-            if rate_limit:
-                sleep(1)
+    # Each repository has its own polling interval: every second, check
+    # a batch of the due repositories, rotating so that they all get
+    # their turn within `rotation-cycles` cycles.
+    repo_queue = collections.deque(repos)
+    batch_size = max(1, math.ceil(len(repos) / cfg.get('rotation-cycles', 4)))
+
+    def next_repo_batch() -> List[_Repository]:
+        batch: List[_Repository] = []
+
+        for _ in range(len(repo_queue)):
+            if len(batch) == batch_size:
+                break
+
+            repo = repo_queue.popleft()
+            repo_queue.append(repo)
+
+            if repo.is_due:
+                batch.append(repo)
+
+        return batch
+
+    def save_state_if_changed():
+        if state_changed.is_set():
+            state_changed.clear()
+            save_state()
+
+    while not stop.is_set():
+        batch = next_repo_batch()
+
+        # announce in batch order, whichever fetch completes first, so
+        # that the channel output doesn't depend on network timing
+        for repo, new_commits in zip(batch, executor.map(get_repo_new_commits, batch)):
+            if new_commits.total_count > 0:
+                announce_repo_new_commits(repo, new_commits)
 
-    while True:
-        for repo in repos:
-            check_repo_new_commits(repo)
+        save_state_if_changed()
+        sleep(1)
 
-        sleep(10)
+    # Wait for the running Git commands, if any. The commits of messages
+    # still queued aren't saved as announced: the next run announces
+    # them again.
+    executor.shutdown(cancel_futures=True)
+    save_state_if_changed()
+    irc_bot.disconnect_from_server()